@@ -3,22 +3,26 @@
 # =============================================================================
 # This script:
 # 1. Connects to Snowflake using credentials from Secrets Manager
-# 2. Extracts yesterday's records (no labels needed)
-# 3. Applies same preprocessing as training
+# 2. Extracts yesterday's records (no labels needed), unloading them to S3 as
+#    Parquet (COPY INTO via a storage integration)
+# 3. Applies categorical preprocessing (NULL fill for the rest happens at inference)
 # 4. Writes to S3 in CSV format for SageMaker Batch Transform
+#
+# Set DEBUG_COMPLETE_OUTPUT=true to also write the full extract as Parquet
+# under complete/ for debugging (off by default; it doubles the write stage).
 # =============================================================================
 
 import sys
 import json
+import functools
+import math
 import boto3
+import snowflake.connector
 from datetime import datetime, timedelta
-from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
 from awsglue.context import GlueContext
 from awsglue.job import Job
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col
 
 # =============================================================================
 # CONFIGURATION - Feature Definitions (must match training)
@@ -134,70 +138,141 @@ NUMERIC_FEATURES = [
     'SECONDARY_NET_REVENUE_MEASURE',
 ]
 
+# All feature columns in the order the model expects them in the CSV
+# (must match ALL_RAW_FEATURES in sagemaker/inference.py)
+ALL_FEATURES = BOOLEAN_FEATURES + CATEGORICAL_FEATURES + NUMERIC_FEATURES
+
+# =============================================================================
+# SQL FRAGMENTS - Preprocessing expressions (built once at import)
+# =============================================================================
+
+_SQL_COLUMN_SEPARATOR = ',\n        '
+
+# Boolean and numeric columns are passed through as-is: NULL → 0 (and
+# TRUE/FALSE → 1/0) happens in the SageMaker inference container, which
+# fills the parsed columns vectorized instead of Snowflake evaluating a
+# per-cell expression for every column
+_BOOL_SQL = _SQL_COLUMN_SEPARATOR.join(BOOLEAN_FEATURES)
+
+# Categorical columns → COALESCE with 'MISSING'
+_CAT_SQL = _SQL_COLUMN_SEPARATOR.join(
+    f"COALESCE(TO_VARCHAR({col_name}), 'MISSING') AS {col_name}"
+    for col_name in CATEGORICAL_FEATURES
+)
+
+_NUM_SQL = _SQL_COLUMN_SEPARATOR.join(NUMERIC_FEATURES)
+
+_FEATURES_SQL = _SQL_COLUMN_SEPARATOR.join([_BOOL_SQL, _CAT_SQL, _NUM_SQL])
+
+# Max size of each Parquet file Snowflake writes when unloading (128MB)
+UNLOAD_MAX_FILE_SIZE = 134217728
+
+# Target rows per features CSV file when FEATURES_PARTITIONS is 0 (auto).
+# Batch Transform parallelism is bounded by the number of input objects.
+RECORDS_PER_FEATURES_PARTITION = 500_000
+
 # =============================================================================
 # MAIN JOB
 # =============================================================================
 
+@functools.lru_cache(maxsize=None)
+def _get_secretsmanager_client(region):
+    """Return a shared Secrets Manager client for the region, creating it once"""
+    return boto3.client('secretsmanager', region_name=region)
+
+
+@functools.lru_cache(maxsize=4)
 def get_snowflake_credentials(secret_name, region):
-    """Retrieve Snowflake credentials from Secrets Manager"""
-    client = boto3.client('secretsmanager', region_name=region)
+    """Retrieve Snowflake credentials from Secrets Manager (cached per secret)"""
+    client = _get_secretsmanager_client(region)
     response = client.get_secret_value(SecretId=secret_name)
     return json.loads(response['SecretString'])
 
 
+def unload_to_s3(creds, query, s3_url, storage_integration):
+    """
+    Run the query in Snowflake and unload the result to S3 as Parquet.
+    Snowflake's native Parquet writer produces the files in parallel and
+    Spark reads them directly, skipping the Spark-Snowflake connector.
+    Returns the number of rows unloaded.
+    """
+    conn = snowflake.connector.connect(
+        account=creds['account'],
+        user=creds['user'],
+        password=creds['password'],
+        database=creds['database'],
+        schema=creds['schema'],
+        warehouse=creds['warehouse'],
+        role=creds.get('role') or None,
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+    COPY INTO '{s3_url}'
+    FROM ({query})
+    STORAGE_INTEGRATION = {storage_integration}
+    FILE_FORMAT = (TYPE = PARQUET COMPRESSION = SNAPPY)
+    HEADER = TRUE
+    OVERWRITE = TRUE
+    MAX_FILE_SIZE = {UNLOAD_MAX_FILE_SIZE}
+    """)
+        # COPY INTO <location> returns (rows_unloaded, input_bytes, output_bytes)
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
 def build_inference_sql(source_table, id_column):
     """
     Build SQL for inference data extraction.
     - Includes ID column for joining scores back
-    - Applies same preprocessing as training
+    - Applies same categorical preprocessing as training; boolean/numeric
+      NULLs are filled by the inference container
     - Filters to yesterday's data only
     - Does NOT require target column (we're predicting it)
     """
-    select_parts = []
-    
-    # Include ID column first
-    select_parts.append(id_column)
-    
-    # Boolean columns → 0/1 with NULL → 0
-    for col_name in BOOLEAN_FEATURES:
-        select_parts.append(
-            f"COALESCE(CASE WHEN {col_name} = TRUE THEN 1 ELSE 0 END, 0) AS {col_name}"
-        )
-    
-    # Categorical columns → COALESCE with 'MISSING'
-    for col_name in CATEGORICAL_FEATURES:
-        select_parts.append(
-            f"COALESCE(TO_VARCHAR({col_name}), 'MISSING') AS {col_name}"
-        )
-    
-    # Numeric columns → COALESCE with 0
-    for col_name in NUMERIC_FEATURES:
-        select_parts.append(
-            f"COALESCE({col_name}, 0) AS {col_name}"
-        )
-    
-    columns_sql = ',\n        '.join(select_parts)
+    # ID column first, then the preprocessed features
+    columns_sql = _SQL_COLUMN_SEPARATOR.join([id_column, _FEATURES_SQL])
     
     # Get yesterday's data
+    # Half-open range on the raw column (not DATE(CREATED_AT)) so Snowflake
+    # can prune micro-partitions on CREATED_AT. Pruning is most effective if
+    # the source table is clustered on it (ALTER TABLE ... CLUSTER BY (CREATED_AT))
     query = f"""
     SELECT 
         {columns_sql}
     FROM {source_table}
-    WHERE DATE(CREATED_AT) = DATEADD(day, -1, CURRENT_DATE())
+    WHERE CREATED_AT >= DATEADD(day, -1, CURRENT_DATE())
+      AND CREATED_AT < CURRENT_DATE()
     """
     
     return query
 
 
+def get_features_partitions(configured, record_count, default_parallelism):
+    """
+    Number of files to split the features CSV into.
+    A positive FEATURES_PARTITIONS is used as-is; 0 sizes it from the data.
+    """
+    if configured > 0:
+        return configured
+    return max(default_parallelism, math.ceil(record_count / RECORDS_PER_FEATURES_PARTITION))
+
+
 def main():
     # Get job arguments
     args = getResolvedOptions(sys.argv, [
         'JOB_NAME',
+        'JOB_RUN_ID',
         'SECRET_NAME',
         'S3_BUCKET',
         'S3_PREFIX',
         'SNOWFLAKE_SOURCE_TABLE',
-        'ID_COLUMN'
+        'ID_COLUMN',
+        'SNOWFLAKE_STORAGE_INTEGRATION',
+        'FEATURES_PARTITIONS',
+        'DEBUG_COMPLETE_OUTPUT'
     ])
     
     # Initialize Spark/Glue context
@@ -214,17 +289,6 @@ def main():
     print(f"Retrieving Snowflake credentials from: {args['SECRET_NAME']}")
     creds = get_snowflake_credentials(args['SECRET_NAME'], region)
     
-    # Configure Snowflake connection
-    sfOptions = {
-        "sfURL": f"{creds['account']}.snowflakecomputing.com",
-        "sfUser": creds['user'],
-        "sfPassword": creds['password'],
-        "sfDatabase": creds['database'],
-        "sfSchema": creds['schema'],
-        "sfWarehouse": creds['warehouse'],
-        "sfRole": creds.get('role', ''),
-    }
-    
     # Build inference query
     query = build_inference_sql(
         source_table=args['SNOWFLAKE_SOURCE_TABLE'],
@@ -235,14 +299,24 @@ def main():
     print(f"Source table: {args['SNOWFLAKE_SOURCE_TABLE']}")
     print(f"ID column: {args['ID_COLUMN']}")
     
-    # Read from Snowflake
-    df = spark.read \
-        .format("net.snowflake.spark.snowflake") \
-        .options(**sfOptions) \
-        .option("query", query) \
-        .load()
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
     
-    record_count = df.count()
+    # Unload from Snowflake to S3 (Parquet), then read the files with Spark.
+    # The query runs exactly once; the count comes from the COPY result.
+    # OVERWRITE = TRUE leaves stale files from an earlier same-day run in
+    # place, so every run unloads to its own prefix.
+    unload_path = (
+        f"s3://{args['S3_BUCKET']}/temp/snowflake_unload/inference/"
+        f"{yesterday}/{args['JOB_RUN_ID']}/"
+    )
+    print(f"Unloading to: {unload_path}")
+    
+    record_count = unload_to_s3(
+        creds,
+        query,
+        unload_path,
+        args['SNOWFLAKE_STORAGE_INTEGRATION']
+    )
     print(f"Records to score: {record_count:,}")
     
     if record_count == 0:
@@ -250,41 +324,52 @@ def main():
         job.commit()
         return
     
+    df = spark.read.parquet(unload_path)
+    
     # Write to S3
-    # For SageMaker Batch Transform, we need:
-    # 1. A file with IDs (to join back later)
-    # 2. A file with features only (for prediction)
+    # For SageMaker Batch Transform we write a single CSV with the ID column
+    # first, followed by the features. The transform job strips the ID with
+    # InputFilter="$[1:]" before the model sees the row and joins it back onto
+    # the prediction (JoinSource=Input, OutputFilter="$[0,-1]"), so the output
+    # is already (id, score) and no positional join is needed afterwards.
     
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
     output_path = f"s3://{args['S3_BUCKET']}/{args['S3_PREFIX']}/{yesterday}"
     
     print(f"Writing to: {output_path}")
     
-    # Save IDs separately (for joining scores back)
-    df.select(args['ID_COLUMN']) \
-        .write \
-        .mode("overwrite") \
-        .option("header", "true") \
-        .csv(f"{output_path}/ids")
+    # Save ID + features (for SageMaker Batch Transform)
+    # XGBoost expects CSV without headers; the ID column is filtered out by
+    # the transform job before inference. Gzipped to cut S3 bytes on the
+    # numeric-heavy rows (the transform job sets CompressionType = "Gzip").
+    # Repartitioned (with a shuffle, to even out file sizes) so the transform
+    # job can fan out across instances instead of scoring one huge file
+    target_n = get_features_partitions(
+        configured=int(args['FEATURES_PARTITIONS']),
+        record_count=record_count,
+        default_parallelism=sc.defaultParallelism
+    )
+    print(f"Features partitions: {target_n}")
     
-    # Save features only (for SageMaker Batch Transform)
-    # XGBoost expects CSV without headers, features only
-    feature_cols = BOOLEAN_FEATURES + CATEGORICAL_FEATURES + NUMERIC_FEATURES
-    df.select(feature_cols) \
+    df.select([args['ID_COLUMN']] + ALL_FEATURES) \
+        .repartition(target_n) \
         .write \
         .mode("overwrite") \
         .option("header", "false") \
+        .option("compression", "gzip") \
         .csv(f"{output_path}/features")
     
-    # Also save complete data for reference/debugging
-    df.write \
-        .mode("overwrite") \
-        .option("header", "true") \
-        .parquet(f"{output_path}/complete")
+    # Optionally save complete data for reference/debugging
+    write_complete = args['DEBUG_COMPLETE_OUTPUT'].lower() == 'true'
+    if write_complete:
+        df.write \
+            .mode("overwrite") \
+            .option("compression", "snappy") \
+            .parquet(f"{output_path}/complete")
     
     print("Inference data extraction complete!")
-    print(f"  IDs saved to: {output_path}/ids/")
-    print(f"  Features saved to: {output_path}/features/")
+    print(f"  ID + features saved to: {output_path}/features/")
+    if write_complete:
+        print(f"  Complete data saved to: {output_path}/complete/")
     
     job.commit()
 
@@ -3,21 +3,21 @@
 # =============================================================================
 # This script:
 # 1. Connects to Snowflake using credentials from Secrets Manager
-# 2. Executes the preprocessing SQL (matching Fabian's notebook logic)
+# 2. Executes the preprocessing SQL (matching Fabian's notebook logic) and
+#    unloads the result to S3 as Parquet (COPY INTO via a storage integration)
 # 3. Writes the data to S3 in Parquet format for SageMaker
 # =============================================================================
 
 import sys
 import json
+import functools
 import boto3
-from datetime import datetime, timedelta
-from awsglue.transforms import *
+import snowflake.connector
+from datetime import datetime
 from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
 from awsglue.context import GlueContext
 from awsglue.job import Job
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, when, coalesce, lit, rand
 
 # =============================================================================
 # CONFIGURATION - Feature Definitions (from Snowflake ML notebook)
@@ -133,62 +133,109 @@ NUMERIC_FEATURES = [
     'SECONDARY_NET_REVENUE_MEASURE',
 ]
 
+# =============================================================================
+# SQL FRAGMENTS - Preprocessing expressions (built once at import)
+# =============================================================================
+
+_SQL_COLUMN_SEPARATOR = ',\n        '
+
+# Boolean columns → 0/1 with NULL → 0
+_BOOL_SQL = _SQL_COLUMN_SEPARATOR.join(
+    f"COALESCE(CASE WHEN {col_name} = TRUE THEN 1 ELSE 0 END, 0) AS {col_name}"
+    for col_name in BOOLEAN_FEATURES
+)
+
+# Categorical columns → COALESCE with 'MISSING'
+_CAT_SQL = _SQL_COLUMN_SEPARATOR.join(
+    f"COALESCE(TO_VARCHAR({col_name}), 'MISSING') AS {col_name}"
+    for col_name in CATEGORICAL_FEATURES
+)
+
+# Numeric columns → COALESCE with 0
+_NUM_SQL = _SQL_COLUMN_SEPARATOR.join(
+    f"COALESCE({col_name}, 0) AS {col_name}"
+    for col_name in NUMERIC_FEATURES
+)
+
+_FEATURES_SQL = _SQL_COLUMN_SEPARATOR.join([_BOOL_SQL, _CAT_SQL, _NUM_SQL])
+
+# Max size of each Parquet file Snowflake writes when unloading (128MB)
+UNLOAD_MAX_FILE_SIZE = 134217728
+
 # =============================================================================
 # MAIN JOB
 # =============================================================================
 
+@functools.lru_cache(maxsize=None)
+def _get_secretsmanager_client(region):
+    """Return a shared Secrets Manager client for the region, creating it once"""
+    return boto3.client('secretsmanager', region_name=region)
+
+
+@functools.lru_cache(maxsize=4)
 def get_snowflake_credentials(secret_name, region):
-    """Retrieve Snowflake credentials from Secrets Manager"""
-    client = boto3.client('secretsmanager', region_name=region)
+    """Retrieve Snowflake credentials from Secrets Manager (cached per secret)"""
+    client = _get_secretsmanager_client(region)
     response = client.get_secret_value(SecretId=secret_name)
     return json.loads(response['SecretString'])
 
 
-def build_preprocessing_sql(source_table, days_limit, test_size=0.20, random_seed=42):
+def unload_to_s3(creds, query, s3_url, storage_integration):
+    """
+    Run the query in Snowflake and unload the result to S3 as Parquet.
+    Snowflake's native Parquet writer produces the files in parallel and
+    Spark reads them directly, skipping the Spark-Snowflake connector.
+    Returns the number of rows unloaded.
+    """
+    conn = snowflake.connector.connect(
+        account=creds['account'],
+        user=creds['user'],
+        password=creds['password'],
+        database=creds['database'],
+        schema=creds['schema'],
+        warehouse=creds['warehouse'],
+        role=creds.get('role') or None,
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+    COPY INTO '{s3_url}'
+    FROM ({query})
+    STORAGE_INTEGRATION = {storage_integration}
+    FILE_FORMAT = (TYPE = PARQUET COMPRESSION = SNAPPY)
+    HEADER = TRUE
+    OVERWRITE = TRUE
+    MAX_FILE_SIZE = {UNLOAD_MAX_FILE_SIZE}
+    """)
+        # COPY INTO <location> returns (rows_unloaded, input_bytes, output_bytes)
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def build_preprocessing_sql(source_table, id_column, days_limit, test_size=0.20, random_seed=42):
     """
     Build SQL that handles all preprocessing in Snowflake.
     Matches the logic from the Snowflake ML notebook.
-    """
-    select_parts = []
-    
-    # Boolean columns → 0/1 with NULL → 0
-    for col_name in BOOLEAN_FEATURES:
-        select_parts.append(
-            f"COALESCE(CASE WHEN {col_name} = TRUE THEN 1 ELSE 0 END, 0) AS {col_name}"
-        )
     
-    # Categorical columns → COALESCE with 'MISSING'
-    for col_name in CATEGORICAL_FEATURES:
-        select_parts.append(
-            f"COALESCE(TO_VARCHAR({col_name}), 'MISSING') AS {col_name}"
-        )
-    
-    # Numeric columns → COALESCE with 0
-    for col_name in NUMERIC_FEATURES:
-        select_parts.append(
-            f"COALESCE({col_name}, 0) AS {col_name}"
-        )
-    
-    # Target column
-    select_parts.append(TARGET)
-    
-    columns_sql = ',\n        '.join(select_parts)
+    The train/test split hashes the ID column (salted with random_seed), so a
+    given record always lands in the same split across re-runs.
+    """
+    # Preprocessed features, then the target column
+    columns_sql = _SQL_COLUMN_SEPARATOR.join([_FEATURES_SQL, TARGET])
+    test_pct = round(test_size * 100)
     
     query = f"""
-    WITH cleaned_data AS (
-        SELECT 
-            {columns_sql},
-            RANDOM({random_seed}) AS split_key
-        FROM {source_table}
-        WHERE {TARGET} IS NOT NULL
-          AND CREATED_AT >= DATEADD(day, -{days_limit}, CURRENT_DATE())
-    )
-    SELECT *,
+    SELECT 
+        {columns_sql},
         CASE 
-            WHEN split_key < {test_size} THEN 'TEST'
+            WHEN ABS(HASH({id_column}, {random_seed})) % 100 < {test_pct} THEN 'TEST'
             ELSE 'TRAIN'
         END AS DATA_SPLIT
-    FROM cleaned_data
+    FROM {source_table}
+    WHERE {TARGET} IS NOT NULL
+      AND CREATED_AT >= DATEADD(day, -{days_limit}, CURRENT_DATE())
     """
     
     return query
@@ -198,11 +245,14 @@ def main():
     # Get job arguments
     args = getResolvedOptions(sys.argv, [
         'JOB_NAME',
+        'JOB_RUN_ID',
         'SECRET_NAME',
         'S3_BUCKET',
         'S3_PREFIX',
         'SNOWFLAKE_SOURCE_TABLE',
-        'DAYS_LIMIT'
+        'ID_COLUMN',
+        'DAYS_LIMIT',
+        'SNOWFLAKE_STORAGE_INTEGRATION'
     ])
     
     # Initialize Spark/Glue context
@@ -219,64 +269,66 @@ def main():
     print(f"Retrieving Snowflake credentials from: {args['SECRET_NAME']}")
     creds = get_snowflake_credentials(args['SECRET_NAME'], region)
     
-    # Configure Snowflake connection
-    sfOptions = {
-        "sfURL": f"{creds['account']}.snowflakecomputing.com",
-        "sfUser": creds['user'],
-        "sfPassword": creds['password'],
-        "sfDatabase": creds['database'],
-        "sfSchema": creds['schema'],
-        "sfWarehouse": creds['warehouse'],
-        "sfRole": creds.get('role', ''),
-    }
-    
     # Build preprocessing query
     query = build_preprocessing_sql(
         source_table=args['SNOWFLAKE_SOURCE_TABLE'],
+        id_column=args['ID_COLUMN'],
         days_limit=int(args['DAYS_LIMIT'])
     )
     
     print("Executing Snowflake query...")
     print(f"Source table: {args['SNOWFLAKE_SOURCE_TABLE']}")
+    print(f"ID column: {args['ID_COLUMN']}")
     print(f"Days limit: {args['DAYS_LIMIT']}")
     
-    # Read from Snowflake
-    df = spark.read \
-        .format("net.snowflake.spark.snowflake") \
-        .options(**sfOptions) \
-        .option("query", query) \
-        .load()
+    today = datetime.now().strftime("%Y-%m-%d")
+    
+    # Unload from Snowflake to S3 (Parquet), then read the files with Spark.
+    # The query runs exactly once.
+    # OVERWRITE = TRUE leaves stale files from an earlier same-day run in
+    # place, so every run unloads to its own prefix.
+    unload_path = (
+        f"s3://{args['S3_BUCKET']}/temp/snowflake_unload/training/"
+        f"{today}/{args['JOB_RUN_ID']}/"
+    )
+    print(f"Unloading to: {unload_path}")
+    
+    unloaded = unload_to_s3(
+        creds,
+        query,
+        unload_path,
+        args['SNOWFLAKE_STORAGE_INTEGRATION']
+    )
+    if unloaded == 0:
+        raise ValueError("Training query returned no records")
     
-    # Get counts
-    total_count = df.count()
-    train_count = df.filter(col("DATA_SPLIT") == "TRAIN").count()
-    test_count = df.filter(col("DATA_SPLIT") == "TEST").count()
+    df = spark.read.parquet(unload_path)
+    
+    # Get counts (single pass, only reads the DATA_SPLIT column)
+    counts = {
+        row['DATA_SPLIT']: row['count']
+        for row in df.groupBy('DATA_SPLIT').count().collect()
+    }
+    train_count = counts.get('TRAIN', 0)
+    test_count = counts.get('TEST', 0)
+    total_count = train_count + test_count
     
     print(f"Total records: {total_count:,}")
     print(f"Train records: {train_count:,}")
     print(f"Test records: {test_count:,}")
     
     # Write to S3 partitioned by DATA_SPLIT
-    today = datetime.now().strftime("%Y-%m-%d")
     output_path = f"s3://{args['S3_BUCKET']}/{args['S3_PREFIX']}/{today}"
     
     print(f"Writing to: {output_path}")
     
-    # Drop the split_key column before saving
-    df = df.drop("split_key")
-    
-    # Write train and test separately for SageMaker
-    df.filter(col("DATA_SPLIT") == "TRAIN") \
-        .drop("DATA_SPLIT") \
-        .write \
-        .mode("overwrite") \
-        .parquet(f"{output_path}/train")
-    
-    df.filter(col("DATA_SPLIT") == "TEST") \
-        .drop("DATA_SPLIT") \
-        .write \
+    # Write train and test in a single pass; rows are routed to
+    # DATA_SPLIT=TRAIN/ and DATA_SPLIT=TEST/ which the SageMaker
+    # train/validation channels point at
+    df.write \
         .mode("overwrite") \
-        .parquet(f"{output_path}/test")
+        .partitionBy("DATA_SPLIT") \
+        .parquet(output_path)
     
     print("Training data extraction complete!")
     
@@ -1,42 +1,89 @@
 # =============================================================================
-# GLUE JOB: Load Fraud Scores back to Snowflake
+# GLUE JOB (Python shell): Load Fraud Scores back to Snowflake
 # =============================================================================
 # This script:
 # 1. Reads SageMaker Batch Transform output from S3
-# 2. Joins scores with IDs
+# 2. Attaches model metadata to the (id, score) pairs
 # 3. Loads the results to Snowflake target table
+#
+# Runs as a Glue Python shell job (pandas + snowflake-connector-python): the
+# input is one small (id, score) file per day, so a Spark cluster only adds
+# cold-start time.
 # =============================================================================
 
+import io
 import sys
 import json
+import functools
 import boto3
 from datetime import datetime, timedelta
-from awsglue.transforms import *
+
+import numpy as np
+import pandas as pd
+import snowflake.connector
+from snowflake.connector.pandas_tools import write_pandas
 from awsglue.utils import getResolvedOptions
-from pyspark.context import SparkContext
-from awsglue.context import GlueContext
-from awsglue.job import Job
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import (
-    col,
-    lit,
-    current_timestamp,
-    monotonically_increasing_id,
-)
-from pyspark.sql.types import FloatType
 
 # =============================================================================
 # MAIN JOB
 # =============================================================================
 
 
+@functools.lru_cache(maxsize=None)
+def _get_secretsmanager_client(region):
+    """Return a shared Secrets Manager client for the region, creating it once"""
+    return boto3.client("secretsmanager", region_name=region)
+
+
+@functools.lru_cache(maxsize=4)
 def get_snowflake_credentials(secret_name, region):
-    """Retrieve Snowflake credentials from Secrets Manager"""
-    client = boto3.client("secretsmanager", region_name=region)
+    """Retrieve Snowflake credentials from Secrets Manager (cached per secret)"""
+    client = _get_secretsmanager_client(region)
     response = client.get_secret_value(SecretId=secret_name)
     return json.loads(response["SecretString"])
 
 
+def read_predictions(bucket, prefix, id_column):
+    """
+    Read all Batch Transform output files under s3://bucket/prefix/.
+    Each line is "<id>,<score>" (no header).
+    """
+    s3 = boto3.client("s3")
+    paginator = s3.get_paginator("list_objects_v2")
+
+    frames = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+            if not body:
+                continue
+            frames.append(
+                pd.read_csv(
+                    io.BytesIO(body),
+                    header=None,
+                    names=[id_column, "PREDICTED_FRAUD_SCORE"],
+                    dtype={id_column: str, "PREDICTED_FRAUD_SCORE": np.float32},
+                )
+            )
+
+    if not frames:
+        return pd.DataFrame(
+            {
+                id_column: pd.Series(dtype=str),
+                "PREDICTED_FRAUD_SCORE": pd.Series(dtype=np.float32),
+            }
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def split_table_name(table_name):
+    """Split a [database.][schema.]table name into (database, schema, table)"""
+    parts = table_name.split(".")
+    database = parts[-3] if len(parts) >= 3 else None
+    schema = parts[-2] if len(parts) >= 2 else None
+    return database, schema, parts[-1]
+
+
 def main():
     # Get job arguments
     args = getResolvedOptions(
@@ -52,13 +99,6 @@ def main():
         ],
     )
 
-    # Initialize Spark/Glue context
-    sc = SparkContext()
-    glueContext = GlueContext(sc)
-    spark = glueContext.spark_session
-    job = Job(glueContext)
-    job.init(args["JOB_NAME"], args)
-
     # Get region from environment
     region = boto3.session.Session().region_name
 
@@ -66,80 +106,100 @@ def main():
     print(f"Retrieving Snowflake credentials from: {args['SECRET_NAME']}")
     creds = get_snowflake_credentials(args["SECRET_NAME"], region)
 
-    # Configure Snowflake connection
-    sfOptions = {
-        "sfURL": f"{creds['account']}.snowflakecomputing.com",
-        "sfUser": creds["user"],
-        "sfPassword": creds["password"],
-        "sfDatabase": creds["database"],
-        "sfSchema": creds["schema"],
-        "sfWarehouse": creds["warehouse"],
-        "sfRole": creds.get("role", ""),
-    }
-
     # Determine paths based on yesterday's date
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    score_date = (datetime.now() - timedelta(days=1)).date()
+    yesterday = score_date.strftime("%Y-%m-%d")
 
-    # Read IDs
-    ids_path = f"s3://{args['S3_BUCKET']}/inference/input/{yesterday}/ids"
-    print(f"Reading IDs from: {ids_path}")
-
-    ids_df = spark.read.option("header", "true").csv(ids_path)
-
-    # Add row index for joining
-    ids_df = ids_df.withColumn("_row_idx", monotonically_increasing_id())
+    id_column = args["ID_COLUMN"]
 
     # Read predictions from SageMaker Batch Transform output
-    predictions_path = f"s3://{args['S3_BUCKET']}/{args['S3_PREFIX']}/{yesterday}"
-    print(f"Reading predictions from: {predictions_path}")
-
-    # SageMaker Batch Transform outputs one prediction per line (no header)
-    predictions_df = (
-        spark.read.option("header", "false")
-        .csv(predictions_path)
-        .withColumnRenamed("_c0", "PREDICTED_FRAUD_SCORE")
-    )
-
-    # Add row index for joining
-    predictions_df = predictions_df.withColumn(
-        "_row_idx", monotonically_increasing_id()
-    )
+    # Batch Transform joins each prediction back onto its input row and keeps
+    # only the ID and the score (OutputFilter="$[0,-1]"), one pair per line
+    predictions_prefix = f"{args['S3_PREFIX']}/{yesterday}/"
+    print(f"Reading predictions from: s3://{args['S3_BUCKET']}/{predictions_prefix}")
 
-    # Join IDs with predictions
-    result_df = ids_df.join(predictions_df, on="_row_idx", how="inner").drop("_row_idx")
-
-    # Add metadata columns
-    result_df = (
-        result_df.withColumn(
-            "PREDICTED_FRAUD_SCORE", col("PREDICTED_FRAUD_SCORE").cast(FloatType())
-        )
-        .withColumn("MODEL_VERSION", lit(args.get("MODEL_VERSION", "unknown")))
-        .withColumn("SCORED_AT", current_timestamp())
-        .withColumn("SCORE_DATE", lit(yesterday))
-    )
+    result_df = read_predictions(args["S3_BUCKET"], predictions_prefix, id_column)
 
     # Rename ID column to match target table
-    id_column = args["ID_COLUMN"]
-    result_df = result_df.withColumnRenamed(id_column, id_column.upper())
+    target_id_column = id_column.upper()
+    result_df = result_df.rename(columns={id_column: target_id_column})
 
-    record_count = result_df.count()
+    record_count = len(result_df)
     print(f"Records to load: {record_count:,}")
 
+    if record_count == 0:
+        print("WARNING: No predictions found for yesterday. Exiting.")
+        return
+
     # Preview the data
     print("Sample output:")
-    result_df.show(5, truncate=False)
+    print(result_df.head(5).to_string(index=False))
 
     # Write to Snowflake
-    # Using 'append' mode to add new scores without overwriting historical data
-    print(f"Writing to Snowflake table: {args['TARGET_TABLE']}")
-
-    result_df.write.format("net.snowflake.spark.snowflake").options(**sfOptions).option(
-        "dbtable", args["TARGET_TABLE"]
-    ).mode("append").save()
-
-    print(f"Successfully loaded {record_count:,} scores to Snowflake!")
-
-    job.commit()
+    # Only (id, score) is staged: write_pandas loads it into a temporary
+    # table (Parquet + COPY INTO), then a single INSERT ... SELECT appends to
+    # the target and adds the metadata columns as constants in Snowflake
+    # instead of shipping them on every row
+    target_table = args["TARGET_TABLE"]
+    print(f"Writing to Snowflake table: {target_table}")
+
+    database, schema, table = split_table_name(target_table)
+    staging_table = f"{table}_STAGING"
+    staging_location = ".".join(p for p in (database, schema, staging_table) if p)
+
+    conn = snowflake.connector.connect(
+        account=creds["account"],
+        user=creds["user"],
+        password=creds["password"],
+        database=creds["database"],
+        schema=creds["schema"],
+        warehouse=creds["warehouse"],
+        role=creds.get("role") or None,
+    )
+    try:
+        success, _, _, _ = write_pandas(
+            conn,
+            result_df,
+            staging_table,
+            database=database,
+            schema=schema,
+            quote_identifiers=False,
+            auto_create_table=True,
+            table_type="temp",
+            compression="snappy",
+            on_error="abort_statement",
+            use_logical_type=True,
+        )
+        if not success:
+            raise RuntimeError(f"write_pandas failed staging {staging_location}")
+
+        cursor = conn.cursor()
+        try:
+            # Using INSERT to append new scores without overwriting historical data
+            cursor.execute(
+                f"""
+                INSERT INTO {target_table}
+                    ({target_id_column}, PREDICTED_FRAUD_SCORE, MODEL_VERSION, SCORED_AT, SCORE_DATE)
+                SELECT
+                    {target_id_column},
+                    PREDICTED_FRAUD_SCORE,
+                    %(model_version)s,
+                    SYSDATE(),
+                    %(score_date)s
+                FROM {staging_location}
+                """,
+                {
+                    "model_version": args.get("MODEL_VERSION", "unknown"),
+                    "score_date": score_date,
+                },
+            )
+            nrows = cursor.rowcount
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+    print(f"Successfully loaded {nrows:,} scores to Snowflake!")
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@
 # =============================================================================
 # This script handles inference for Batch Transform:
 # 1. Loads the trained model and encoder
-# 2. Applies OrdinalEncoder to incoming data
+# 2. Fills boolean/numeric NULLs and applies OrdinalEncoder to incoming data
 # 3. Returns predictions
 # =============================================================================
 
@@ -15,13 +15,29 @@ import io
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import xgboost as xgb
 
+# orjson serializes NumPy arrays natively; optional, not in the stock
+# XGBoost container
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # Global variables for loaded model artifacts
 model = None
 encoder = None
+cat_indexes = None
 feature_names = None
+model_columns = None
+feature_dest = None
+
+# Feature matrix buffer reused across requests (grown on demand)
+_X_buf = None
 
 # Feature definitions (must match training)
 BOOLEAN_FEATURES = [
@@ -131,13 +147,27 @@ NUMERIC_FEATURES = [
 # All raw feature columns in order (for parsing CSV input)
 ALL_RAW_FEATURES = BOOLEAN_FEATURES + CATEGORICAL_FEATURES + NUMERIC_FEATURES
 
+# Schema for parsing CSV input, in ALL_RAW_FEATURES order. Booleans arrive
+# as true/false and booleans/numerics may be empty (NULL) - see
+# _fill_missing. Numerics are parsed straight to float32, the dtype the
+# model consumes
+CSV_SCHEMA = pa.schema(
+    [(c, pa.bool_()) for c in BOOLEAN_FEATURES]
+    + [(c, pa.string()) for c in CATEGORICAL_FEATURES]
+    + [(c, pa.float32()) for c in NUMERIC_FEATURES]
+)
+
+# Rows per inplace_predict call: bounds XGBoost's working memory on large
+# batches and keeps each block cache-resident while the trees are walked
+PREDICT_CHUNK_ROWS = 16_384
+
 
 def model_fn(model_dir):
     """
     Load model artifacts from the model directory.
     Called once when the container starts.
     """
-    global model, encoder, feature_names
+    global model, encoder, cat_indexes, feature_names, model_columns, feature_dest
     
     print(f"Loading model from {model_dir}")
     
@@ -145,6 +175,7 @@ def model_fn(model_dir):
     model_path = os.path.join(model_dir, 'xgboost-model')
     model = xgb.Booster()
     model.load_model(model_path)
+    model.set_param({'nthread': os.cpu_count()})
     print(f"Loaded XGBoost model from {model_path}")
     
     # Load encoder
@@ -153,12 +184,33 @@ def model_fn(model_dir):
         encoder = pickle.load(f)
     print(f"Loaded encoder from {encoder_path}")
     
+    # Per-column category indexes: get_indexer returns the same codes as
+    # encoder.transform (a category's position in categories_, unknown
+    # categories -1) from a hash table built once here
+    cat_indexes = [pd.Index(cats) for cats in encoder.categories_]
+    
     # Load feature names
     features_path = os.path.join(model_dir, 'feature_names.json')
     with open(features_path, 'r') as f:
         feature_names = json.load(f)
     print(f"Loaded {len(feature_names)} feature names")
     
+    # Raw columns the model was trained on (booleans, encoded categoricals,
+    # numerics) and, per group, each column's position in the training
+    # feature order, so predict_fn writes every column straight into place
+    model_columns = (
+        [c for c in BOOLEAN_FEATURES if c in feature_names],
+        [c for c in CATEGORICAL_FEATURES if f"{c}_ENCODED" in feature_names],
+        [c for c in NUMERIC_FEATURES if c in feature_names],
+    )
+    bool_cols, cat_cols, num_cols = model_columns
+    dest_idx = {name: i for i, name in enumerate(feature_names)}
+    feature_dest = (
+        np.array([dest_idx[c] for c in bool_cols], dtype=np.intp),
+        np.array([dest_idx[f"{c}_ENCODED"] for c in cat_cols], dtype=np.intp),
+        np.array([dest_idx[c] for c in num_cols], dtype=np.intp),
+    )
+    
     return model
 
 
@@ -171,12 +223,16 @@ def input_fn(request_body, request_content_type):
     
     if request_content_type == 'text/csv':
         # Parse CSV - no header, columns in order of ALL_RAW_FEATURES
-        df = pd.read_csv(
-            io.StringIO(request_body),
-            header=None,
-            names=ALL_RAW_FEATURES
+        if isinstance(request_body, str):
+            request_body = request_body.encode('utf-8')
+        table = pacsv.read_csv(
+            io.BytesIO(request_body),
+            read_options=pacsv.ReadOptions(column_names=ALL_RAW_FEATURES),
+            convert_options=pacsv.ConvertOptions(column_types=CSV_SCHEMA)
         )
-        return df
+        # One block per column: predict_fn copies each column into the
+        # feature matrix itself, so consolidating here would be a wasted copy
+        return _fill_missing(table).to_pandas(split_blocks=True, self_destruct=True)
     
     elif request_content_type == 'application/json':
         # Parse JSON
@@ -185,48 +241,99 @@ def input_fn(request_body, request_content_type):
             df = pd.DataFrame(data)
         else:
             df = pd.DataFrame([data])
+        # Same NULL → 0 handling _fill_missing applies to CSV numerics
+        # (booleans are filled when predict_fn casts them)
+        num_cols = [c for c in NUMERIC_FEATURES if c in df.columns]
+        df[num_cols] = df[num_cols].fillna(0)
         return df
     
     else:
         raise ValueError(f"Unsupported content type: {request_content_type}")
 
 
-def predict_fn(input_data, model):
+def _fill_missing(table):
     """
-    Apply encoding and make predictions.
+    Apply the NULL handling the inference extract leaves to the container
+    (matches the training preprocessing):
+    - Boolean columns → 0/1 with NULL → 0
+    - Numeric columns → NULL → 0
     """
-    global encoder, feature_names
+    table = table.combine_chunks()
     
-    print(f"Making predictions for {len(input_data)} rows")
+    for col_name in BOOLEAN_FEATURES:
+        i = table.schema.get_field_index(col_name)
+        filled = pc.fill_null(pc.cast(table[col_name], pa.int8()), 0)
+        table = table.set_column(i, col_name, filled)
     
-    # Get available columns
-    available_cols = input_data.columns.tolist()
+    for col_name in NUMERIC_FEATURES:
+        i = table.schema.get_field_index(col_name)
+        filled = pc.fill_null(table[col_name], 0.0)
+        table = table.set_column(i, col_name, filled)
     
-    bool_cols = [c for c in BOOLEAN_FEATURES if c in available_cols]
-    cat_cols = [c for c in CATEGORICAL_FEATURES if c in available_cols]
-    num_cols = [c for c in NUMERIC_FEATURES if c in available_cols]
+    return table
+
+
+def _as_str(col):
+    """
+    Return col as strings, copying only if it isn't all strings already.
+    Object columns are checked element-wise: pandas 1.x reports every
+    object column as a string dtype, so a JSON value such as 8 (or None)
+    would otherwise skip astype(str) and miss its category.
+    """
+    if isinstance(col.dtype, pd.StringDtype):
+        return col
+    if col.dtype == object and pd.api.types.infer_dtype(col, skipna=False) == 'string':
+        return col
+    return col.astype(str)
+
+
+def _encode_column(col, categories, out):
+    """Write one column's category codes (unknown categories → -1) into out"""
+    out[:] = categories.get_indexer(_as_str(col))
+
+
+def _encode_categoricals(df, cat_cols, cat_indexes, X, dest):
+    """Encode each categorical column straight into its slot of X"""
+    for j, c in enumerate(cat_cols):
+        _encode_column(df[c], cat_indexes[j], X[:, dest[j]])
+
+
+def _feature_buffer(n_rows, n_cols):
+    """Return an (n_rows, n_cols) view of the reusable float32 buffer"""
+    global _X_buf
+    if _X_buf is None or _X_buf.shape[0] < n_rows or _X_buf.shape[1] != n_cols:
+        _X_buf = np.empty((n_rows, n_cols), dtype=np.float32, order='C')
+    return _X_buf[:n_rows]
+
+
+def predict_fn(input_data, model):
+    """
+    Apply encoding and make predictions.
+    """
+    global cat_indexes, feature_names, model_columns, feature_dest
     
-    # Apply encoder to categorical columns
-    cat_encoded = encoder.transform(input_data[cat_cols].astype(str))
-    cat_encoded_df = pd.DataFrame(
-        cat_encoded,
-        columns=[f"{c}_ENCODED" for c in cat_cols],
-        index=input_data.index
-    )
+    print(f"Making predictions for {len(input_data)} rows")
     
-    # Combine all features
-    X = pd.concat([
-        input_data[bool_cols].reset_index(drop=True),
-        cat_encoded_df.reset_index(drop=True),
-        input_data[num_cols].reset_index(drop=True)
-    ], axis=1)
+    bool_cols, cat_cols, num_cols = model_columns
+    bool_dest, cat_dest, num_dest = feature_dest
     
-    # Reorder to match training feature order
-    X = X[feature_names]
+    # Fill a C-contiguous float32 matrix in place (the layout XGBoost
+    # ingests without another conversion), each column directly in its
+    # training feature position
+    X = _feature_buffer(len(input_data), len(feature_names))
+    # Booleans are int8 0/1 from _fill_missing; JSON input may still
+    # carry True/False/None, which the same cast handles (per column, as
+    # DataFrame.to_numpy skips na_value on mixed dtypes)
+    for j, col in enumerate(bool_cols):
+        X[:, bool_dest[j]] = input_data[col].to_numpy(dtype=np.int8, na_value=0)
+    _encode_categoricals(input_data, cat_cols, cat_indexes, X, cat_dest)
+    X[:, num_dest] = input_data[num_cols].to_numpy(dtype=np.float32)
     
-    # Create DMatrix and predict
-    dmatrix = xgb.DMatrix(X, feature_names=feature_names)
-    predictions = model.predict(dmatrix)
+    # Predict block by block into one preallocated output
+    predictions = np.empty(len(X), dtype=np.float32)
+    for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+        stop = start + PREDICT_CHUNK_ROWS
+        predictions[start:stop] = model.inplace_predict(X[start:stop])
     
     return predictions
 
@@ -239,10 +346,16 @@ def output_fn(prediction, accept):
     print(f"Formatting {len(prediction)} predictions for output")
     
     if accept == 'text/csv' or accept == '*/*':
-        # One prediction per line (Batch Transform default)
-        return '\n'.join(str(p) for p in prediction)
+        # One prediction per line (Batch Transform default), formatted in C
+        # by NumPy rather than one str() per row. No trailing newline: the
+        # joined output must have exactly one line per input record
+        buf = io.BytesIO()
+        np.savetxt(buf, prediction, fmt='%.7g')
+        return buf.getvalue().decode('ascii').rstrip('\n')
     
     elif accept == 'application/json':
+        if orjson is not None:
+            return orjson.dumps(prediction, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
         return json.dumps(prediction.tolist())
     
     else:
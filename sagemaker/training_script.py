@@ -16,12 +16,23 @@ import pickle
 import tarfile
 from pathlib import Path
 
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as pads
 import xgboost as xgb
 from sklearn.preprocessing import OrdinalEncoder
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
+# CuPy is only present on GPU images; used to hand XGBoost device arrays
+try:
+    import cupy
+except ImportError:
+    cupy = None
+
 
 # =============================================================================
 # FEATURE DEFINITIONS (must match Glue extraction scripts)
@@ -133,25 +144,125 @@ NUMERIC_FEATURES = [
     'SECONDARY_NET_REVENUE_MEASURE',
 ]
 
+# Columns load_data keeps (anything else in the files is never read)
+ALL_RAW_FEATURES = BOOLEAN_FEATURES + CATEGORICAL_FEATURES + NUMERIC_FEATURES
+LOAD_COLUMNS = ALL_RAW_FEATURES + [TARGET]
+
+# Types load_data casts to before converting to pandas: numeric features
+# go straight to float32 (the dtype XGBoost consumes; Snowflake NUMBER
+# columns otherwise arrive as decimals), booleans to int8
+LOAD_COLUMN_TYPES = {
+    **{c: pa.int8() for c in BOOLEAN_FEATURES},
+    **{c: pa.float32() for c in NUMERIC_FEATURES},
+    TARGET: pa.float64(),
+}
+
+# Column types for CSV input, so categorical codes such as '08' stay strings
+# (booleans arrive as 0/1). Also the types of the null columns added for
+# LOAD_COLUMNS a file lacks, so every file ends up with the same schema
+CSV_COLUMN_TYPES = {
+    **{c: pa.int8() for c in BOOLEAN_FEATURES},
+    **{c: pa.string() for c in CATEGORICAL_FEATURES},
+    **{c: pa.float32() for c in NUMERIC_FEATURES},
+    TARGET: pa.float64(),
+}
+
+
+def _read_csv_table(path: Path) -> pa.Table:
+    """Read one CSV file with pyarrow, keeping only LOAD_COLUMNS"""
+    table = pacsv.read_csv(
+        str(path),
+        convert_options=pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+    )
+    return table.select([c for c in LOAD_COLUMNS if c in table.column_names])
+
+
+def _align_columns(table: pa.Table, columns: list) -> pa.Table:
+    """
+    Return table with exactly these columns, in order, adding the ones it
+    lacks as typed all-null columns (NaN in pandas, like pd.concat did)
+    """
+    arrays = [
+        table[c] if c in table.column_names
+        else pa.nulls(table.num_rows, type=CSV_COLUMN_TYPES[c])
+        for c in columns
+    ]
+    return pa.table(arrays, names=columns)
+
 
 def load_data(data_dir: str) -> pd.DataFrame:
-    """Load all parquet files from a directory into a single DataFrame."""
+    """
+    Load all parquet (or CSV) files under a directory into a single DataFrame.
+    Files are read in parallel by pyarrow and only LOAD_COLUMNS are kept;
+    the result is converted to pandas once, with no per-file concat.
+    """
     data_path = Path(data_dir)
     
-    # Handle both parquet and CSV formats
-    parquet_files = list(data_path.glob("*.parquet")) + list(data_path.glob("**/*.parquet"))
-    csv_files = list(data_path.glob("*.csv")) + list(data_path.glob("**/*.csv"))
+    # Handle both parquet and CSV formats (rglob also matches the top level).
+    # Zero-byte CSVs have no header, which pyarrow rejects, so skip them
+    parquet_files = sorted(data_path.rglob("*.parquet"))
+    csv_files = [f for f in sorted(data_path.rglob("*.csv")) if f.stat().st_size > 0]
     
     if parquet_files:
         print(f"Loading {len(parquet_files)} parquet files from {data_dir}")
-        dfs = [pd.read_parquet(f) for f in parquet_files]
-        return pd.concat(dfs, ignore_index=True)
+        dataset = pads.dataset([str(f) for f in parquet_files], format='parquet')
+        columns = [c for c in LOAD_COLUMNS if c in dataset.schema.names]
+        table = dataset.to_table(columns=columns, use_threads=True)
     elif csv_files:
         print(f"Loading {len(csv_files)} CSV files from {data_dir}")
-        dfs = [pd.read_csv(f) for f in csv_files]
-        return pd.concat(dfs, ignore_index=True)
+        with ThreadPoolExecutor() as pool:
+            tables = list(pool.map(_read_csv_table, csv_files))
+        # Give every table the union of the columns found, so concat_tables
+        # only links chunks of identical schemas
+        found = set().union(*(t.column_names for t in tables))
+        columns = [c for c in LOAD_COLUMNS if c in found]
+        table = pa.concat_tables([_align_columns(t, columns) for t in tables])
     else:
         raise ValueError(f"No parquet or CSV files found in {data_dir}")
+    
+    schema = pa.schema([
+        field.with_type(LOAD_COLUMN_TYPES.get(field.name, field.type))
+        for field in table.schema
+    ])
+    table = table.cast(schema)
+    
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _as_str(col: pd.Series) -> pd.Series:
+    """
+    Return col as strings, copying only if it isn't all strings already.
+    Object columns are checked element-wise: pandas 1.x reports every
+    object column as a string dtype, so a JSON value such as 8 (or None)
+    would otherwise skip astype(str) and miss its category.
+    """
+    if isinstance(col.dtype, pd.StringDtype):
+        return col
+    if col.dtype == object and pd.api.types.infer_dtype(col, skipna=False) == 'string':
+        return col
+    return col.astype(str)
+
+
+def _encode_column(col: pd.Series, categories: pd.Index, out: np.ndarray):
+    """Write one column's category codes (unknown categories → -1) into out"""
+    out[:] = categories.get_indexer(_as_str(col))
+
+
+def _encode_categoricals(df: pd.DataFrame, cat_cols: list, cat_indexes: list,
+                         X: np.ndarray, dest: list):
+    """Encode each categorical column straight into column dest[j] of X"""
+    for j, c in enumerate(cat_cols):
+        _encode_column(df[c], cat_indexes[j], X[:, dest[j]])
+
+
+def build_category_indexes(encoder: OrdinalEncoder):
+    """
+    Convert a fitted OrdinalEncoder into one pd.Index of categories per
+    column. Index.get_indexer gives the same codes as encoder.transform
+    (unknown categories → -1) from a hash lookup, without sklearn's
+    per-column searchsorted and float64 output.
+    """
+    return [pd.Index(cats) for cats in encoder.categories_]
 
 
 def prepare_features(df: pd.DataFrame, encoder: OrdinalEncoder = None, fit: bool = False):
@@ -168,12 +279,13 @@ def prepare_features(df: pd.DataFrame, encoder: OrdinalEncoder = None, fit: bool
         fit: Whether to fit the encoder (True for training data)
     
     Returns:
-        X: Feature matrix
+        X: Feature matrix (C-contiguous float32 ndarray)
         y: Target vector (if TARGET in df)
         encoder: Fitted encoder
+        feature_names: Column names of X, in order
     """
     # Filter to available columns
-    available_cols = df.columns.tolist()
+    available_cols = set(df.columns)
     
     bool_cols = [c for c in BOOLEAN_FEATURES if c in available_cols]
     cat_cols = [c for c in CATEGORICAL_FEATURES if c in available_cols]
@@ -181,44 +293,49 @@ def prepare_features(df: pd.DataFrame, encoder: OrdinalEncoder = None, fit: bool
     
     print(f"Features found: {len(bool_cols)} boolean, {len(cat_cols)} categorical, {len(num_cols)} numeric")
     
-    # Handle categorical encoding
+    # Handle categorical encoding: sklearn fits the categories, the codes
+    # are then looked up per column from a pandas Index
     if fit:
         encoder = OrdinalEncoder(
             handle_unknown='use_encoded_value',
             unknown_value=-1
         )
-        cat_encoded = encoder.fit_transform(df[cat_cols].astype(str))
-    else:
-        cat_encoded = encoder.transform(df[cat_cols].astype(str))
+        encoder.fit(df[cat_cols].apply(_as_str))
+    cat_indexes = build_category_indexes(encoder)
     
-    # Create encoded column names
-    cat_encoded_df = pd.DataFrame(
-        cat_encoded,
-        columns=[f"{c}_ENCODED" for c in cat_cols],
-        index=df.index
-    )
+    # Fill a C-contiguous float32 matrix in place instead of concatenating
+    # DataFrames (the layout XGBoost ingests without another conversion)
+    nb, nc = len(bool_cols), len(cat_cols)
+    X = np.empty((len(df), nb + nc + len(num_cols)), dtype=np.float32, order='C')
+    X[:, :nb] = df[bool_cols].to_numpy(dtype=np.float32)
+    _encode_categoricals(df, cat_cols, cat_indexes, X, range(nb, nb + nc))
+    X[:, nb + nc:] = df[num_cols].to_numpy(dtype=np.float32)
     
-    # Combine all features
-    X = pd.concat([
-        df[bool_cols].reset_index(drop=True),
-        cat_encoded_df.reset_index(drop=True),
-        df[num_cols].reset_index(drop=True)
-    ], axis=1)
+    feature_names = bool_cols + [f"{c}_ENCODED" for c in cat_cols] + num_cols
     
     # Get target if available
     y = None
     if TARGET in df.columns:
         y = df[TARGET].values
     
-    return X, y, encoder
+    return X, y, encoder, feature_names
 
 
-def train_model(X_train, y_train, X_val, y_val, hyperparams: dict):
-    """Train XGBoost model with given hyperparameters."""
+def train_model(X_train, y_train, X_val, y_val, feature_names, hyperparams: dict):
+    """
+    Train XGBoost model with given hyperparameters.
+    
+    Returns the model together with the train and validation matrices so
+    evaluation can reuse them instead of rebuilding them.
+    """
     
-    # Create DMatrix for XGBoost
-    dtrain = xgb.DMatrix(X_train, label=y_train, feature_names=X_train.columns.tolist())
-    dval = xgb.DMatrix(X_val, label=y_val, feature_names=X_val.columns.tolist())
+    device = hyperparams.get('device', 'cpu')
+    
+    # On GPU, move the matrices to the device once so XGBoost doesn't copy
+    # them from host memory
+    if device.startswith('cuda') and cupy is not None:
+        X_train, y_train = cupy.asarray(X_train), cupy.asarray(y_train)
+        X_val, y_val = cupy.asarray(X_val), cupy.asarray(y_val)
     
     # XGBoost parameters (matching your Snowflake ML notebook)
     params = {
@@ -230,8 +347,29 @@ def train_model(X_train, y_train, X_val, y_val, hyperparams: dict):
         'seed': int(hyperparams.get('seed', 42)),
         'tree_method': hyperparams.get('tree_method', 'hist'),
         'eval_metric': hyperparams.get('eval_metric', 'rmse'),
+        'max_bin': int(hyperparams.get('max_bin', 256)),
     }
     
+    # GPU training: XGBoost >= 2.0 takes a device parameter, older versions
+    # (e.g. the 1.7 container) select it through the tree method
+    if device != 'cpu':
+        if int(xgb.__version__.split('.')[0]) >= 2:
+            params['device'] = device
+        else:
+            params['tree_method'] = 'gpu_hist'
+    
+    # Create DMatrix for XGBoost. The hist methods only need the quantized
+    # bins, which QuantileDMatrix builds directly without keeping the full
+    # float matrix; validation reuses the training bin edges (ref=dtrain)
+    if params['tree_method'] in ('hist', 'gpu_hist'):
+        dtrain = xgb.QuantileDMatrix(X_train, label=y_train, feature_names=feature_names,
+                                     max_bin=params['max_bin'])
+        dval = xgb.QuantileDMatrix(X_val, label=y_val, feature_names=feature_names,
+                                   ref=dtrain)
+    else:
+        dtrain = xgb.DMatrix(X_train, label=y_train, feature_names=feature_names)
+        dval = xgb.DMatrix(X_val, label=y_val, feature_names=feature_names)
+    
     num_round = int(hyperparams.get('num_round', 1400))
     
     print(f"Training XGBoost with {num_round} rounds...")
@@ -249,13 +387,20 @@ def train_model(X_train, y_train, X_val, y_val, hyperparams: dict):
         verbose_eval=100
     )
     
-    return model
+    return model, dtrain, dval
 
 
-def evaluate_model(model, X, y, dataset_name: str):
-    """Evaluate model and print metrics."""
-    dmatrix = xgb.DMatrix(X, feature_names=X.columns.tolist())
-    predictions = model.predict(dmatrix)
+def evaluate_model(model, data, y, dataset_name: str):
+    """
+    Evaluate model and print metrics.
+    
+    data is either a (Quantile)DMatrix already built for training, or a
+    feature array, which is predicted on directly without building one.
+    """
+    if isinstance(data, xgb.DMatrix):
+        predictions = model.predict(data)
+    else:
+        predictions = model.inplace_predict(data)
     
     rmse = np.sqrt(mean_squared_error(y, predictions))
     mae = mean_absolute_error(y, predictions)
@@ -313,6 +458,8 @@ def parse_args():
     parser.add_argument('--seed', type=int, default=42)
     parser.add_argument('--tree_method', type=str, default='hist')
     parser.add_argument('--eval_metric', type=str, default='rmse')
+    parser.add_argument('--max_bin', type=int, default=256)
+    parser.add_argument('--device', type=str, default='cpu')
     
     # SageMaker specific environment variables
     parser.add_argument('--model-dir', type=str, default=os.environ.get('SM_MODEL_DIR', '/opt/ml/model'))
@@ -340,6 +487,8 @@ def main():
         'seed': args.seed,
         'tree_method': args.tree_method,
         'eval_metric': args.eval_metric,
+        'max_bin': args.max_bin,
+        'device': args.device,
     }
     
     # Load data
@@ -353,23 +502,23 @@ def main():
     
     # Prepare features
     print("\nPreparing features...")
-    X_train, y_train, encoder = prepare_features(train_df, fit=True)
-    X_val, y_val, _ = prepare_features(val_df, encoder=encoder, fit=False)
+    X_train, y_train, encoder, feature_names = prepare_features(train_df, fit=True)
+    X_val, y_val, _, _ = prepare_features(val_df, encoder=encoder, fit=False)
     
     print(f"Training features shape: {X_train.shape}")
     print(f"Validation features shape: {X_val.shape}")
     
     # Train model
     print("\nTraining model...")
-    model = train_model(X_train, y_train, X_val, y_val, hyperparams)
+    model, dtrain, dval = train_model(X_train, y_train, X_val, y_val, feature_names, hyperparams)
     
-    # Evaluate
-    train_metrics = evaluate_model(model, X_train, y_train, "TRAINING")
-    val_metrics = evaluate_model(model, X_val, y_val, "VALIDATION")
+    # Evaluate on the matrices built for training
+    train_metrics = evaluate_model(model, dtrain, y_train, "TRAINING")
+    val_metrics = evaluate_model(model, dval, y_val, "VALIDATION")
     
     # Save model artifacts
     print("\nSaving model artifacts...")
-    save_model(model, encoder, X_train.columns.tolist(), args.model_dir)
+    save_model(model, encoder, feature_names, args.model_dir)
     
     # Save metrics for SageMaker
     metrics_path = os.path.join(args.model_dir, 'metrics.json')
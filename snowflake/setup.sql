@@ -48,6 +48,26 @@ ON FRAUD_SCORES (VISIT_ID);
 CREATE OR REPLACE INDEX IDX_FRAUD_SCORES_SCORE_DATE 
 ON FRAUD_SCORES (SCORE_DATE);
 
+-- =============================================================================
+-- S3 STORAGE INTEGRATION (used by the Glue extract jobs to unload Parquet)
+-- =============================================================================
+-- The extract jobs run COPY INTO 's3://<bucket>/temp/snowflake_unload/...'
+-- with this integration. The IAM role is created by Terraform: replace the
+-- role ARN with `terragrunt output -raw snowflake_unload_role_arn`, then put
+-- STORAGE_AWS_IAM_USER_ARN / STORAGE_AWS_EXTERNAL_ID from DESC INTEGRATION
+-- into snowflake_iam_user_arn / snowflake_external_id and apply again.
+-- Requires ACCOUNTADMIN (or CREATE INTEGRATION privilege).
+
+CREATE STORAGE INTEGRATION IF NOT EXISTS FRAUD_SCORING_S3
+    TYPE = EXTERNAL_STAGE
+    STORAGE_PROVIDER = 'S3'
+    ENABLED = TRUE
+    STORAGE_AWS_ROLE_ARN = 'arn:aws:iam::YOUR_ACCOUNT_ID:role/fraud-scoring-snowflake-unload-ENV'
+    STORAGE_ALLOWED_LOCATIONS = ('s3://YOUR_BUCKET/temp/snowflake_unload/');
+
+-- DESC INTEGRATION FRAUD_SCORING_S3;
+-- GRANT USAGE ON INTEGRATION FRAUD_SCORING_S3 TO ROLE YOUR_ROLE;
+
 -- =============================================================================
 -- SAMPLE QUERIES
 -- =============================================================================
@@ -17,7 +17,6 @@ inputs = {
   environment = "dev"
   
   # Snowflake - UPDATE THESE VALUES
-  snowflake_account      = "YOUR_ACCOUNT.us-east-1"  # e.g., "xy12345.us-east-1"
   snowflake_source_table = "ZPUB_PROD.LOOKER_PDT_ZXM.H2_ZPUB_ANALYTICS_ANALYTICS_QUALITY_BY_VISIT_TRAINING"
   snowflake_scores_table = "ZPUB_PROD.ZXM_ANALYTICS.FRAUD_SCORES_DEV"
   id_column              = "VISIT_ID"  # UPDATE with actual ID column
@@ -22,9 +22,11 @@ module "s3" {
 module "iam" {
   source = "./modules/iam"
 
-  project_name  = var.project_name
-  environment   = var.environment
-  s3_bucket_arn = module.s3.bucket_arn
+  project_name           = var.project_name
+  environment            = var.environment
+  s3_bucket_arn          = module.s3.bucket_arn
+  snowflake_iam_user_arn = var.snowflake_iam_user_arn
+  snowflake_external_id  = var.snowflake_external_id
 }
 
 # =============================================================================
@@ -34,17 +36,18 @@ module "iam" {
 module "glue" {
   source = "./modules/glue"
 
-  project_name           = var.project_name
-  environment            = var.environment
-  s3_bucket_name         = module.s3.bucket_name
-  glue_role_arn          = module.iam.glue_role_arn
-  snowflake_account      = var.snowflake_account
-  snowflake_source_table = var.snowflake_source_table
-  snowflake_scores_table = var.snowflake_scores_table
-  id_column              = var.id_column
-  training_days_limit    = var.training_days_limit
-  glue_worker_type       = var.glue_worker_type
-  glue_num_workers       = var.glue_num_workers
+  project_name                  = var.project_name
+  environment                   = var.environment
+  s3_bucket_name                = module.s3.bucket_name
+  glue_role_arn                 = module.iam.glue_role_arn
+  snowflake_source_table        = var.snowflake_source_table
+  snowflake_scores_table        = var.snowflake_scores_table
+  snowflake_storage_integration = var.snowflake_storage_integration
+  id_column                     = var.id_column
+  training_days_limit           = var.training_days_limit
+  inference_features_partitions = var.inference_features_partitions
+  glue_worker_type              = var.glue_worker_type
+  glue_num_workers              = var.glue_num_workers
 }
 
 # =============================================================================
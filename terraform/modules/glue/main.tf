@@ -2,7 +2,7 @@
 # AWS GLUE RESOURCES FOR FRAUD SCORING PIPELINE
 # =============================================================================
 # This module creates:
-# - Snowflake connection (using Secrets Manager)
+# - Snowflake credentials secret (Secrets Manager)
 # - Glue jobs for data extraction and loading
 # =============================================================================
 
@@ -35,29 +35,6 @@ resource "aws_secretsmanager_secret" "snowflake" {
 #   "role": "your-role"
 # }
 
-# =============================================================================
-# GLUE CONNECTION - Snowflake (using JDBC)
-# =============================================================================
-
-resource "aws_glue_connection" "snowflake" {
-  name            = "${var.project_name}-snowflake-${var.environment}"
-  connection_type = "CUSTOM"
-
-  connection_properties = {
-    CONNECTOR_CLASS_NAME = "net.snowflake.client.jdbc.SnowflakeDriver"
-    CONNECTOR_TYPE       = "Jdbc"
-    CONNECTOR_URL        = "s3://${var.s3_bucket_name}/scripts/glue/snowflake-jdbc.jar"
-    JDBC_CONNECTION_URL  = "jdbc:snowflake://${var.snowflake_account}.snowflakecomputing.com"
-    SECRET_ID            = aws_secretsmanager_secret.snowflake.name
-  }
-
-  tags = {
-    Project     = var.project_name
-    Environment = var.environment
-    ManagedBy   = "terraform"
-  }
-}
-
 # =============================================================================
 # GLUE JOB - Extract Training Data
 # =============================================================================
@@ -85,10 +62,12 @@ resource "aws_glue_job" "extract_training_data" {
     "--S3_BUCKET"            = var.s3_bucket_name
     "--S3_PREFIX"            = "training/data"
     "--SNOWFLAKE_SOURCE_TABLE" = var.snowflake_source_table
+    "--ID_COLUMN"            = var.id_column
     "--DAYS_LIMIT"           = tostring(var.training_days_limit)
+    "--SNOWFLAKE_STORAGE_INTEGRATION" = var.snowflake_storage_integration
     
-    # Snowflake JDBC driver
-    "--extra-jars"           = "s3://${var.s3_bucket_name}/scripts/glue/snowflake-jdbc.jar"
+    # Snowflake Python connector (runs the COPY INTO unload)
+    "--additional-python-modules" = "snowflake-connector-python"
   }
 
   glue_version      = "4.0"
@@ -136,9 +115,12 @@ resource "aws_glue_job" "extract_inference_data" {
     "--S3_PREFIX"              = "inference/input"
     "--SNOWFLAKE_SOURCE_TABLE" = var.snowflake_source_table
     "--ID_COLUMN"              = var.id_column
+    "--FEATURES_PARTITIONS"    = tostring(var.inference_features_partitions)
+    "--DEBUG_COMPLETE_OUTPUT"  = "false"  # Set to "true" to also write complete/ Parquet
+    "--SNOWFLAKE_STORAGE_INTEGRATION" = var.snowflake_storage_integration
     
-    # Snowflake JDBC driver
-    "--extra-jars"             = "s3://${var.s3_bucket_name}/scripts/glue/snowflake-jdbc.jar"
+    # Snowflake Python connector (runs the COPY INTO unload)
+    "--additional-python-modules" = "snowflake-connector-python"
   }
 
   glue_version      = "4.0"
@@ -161,24 +143,25 @@ resource "aws_glue_job" "extract_inference_data" {
 # =============================================================================
 # GLUE JOB - Load Scores to Snowflake
 # =============================================================================
+# Python shell job: the daily (id, score) file is small, so pandas +
+# snowflake-connector-python avoids the Spark cluster cold start
 
 resource "aws_glue_job" "load_scores" {
   name     = "${var.project_name}-load-scores-${var.environment}"
   role_arn = var.glue_role_arn
 
   command {
-    name            = "glueetl"
+    name            = "pythonshell"
     script_location = "s3://${var.s3_bucket_name}/scripts/glue/load_scores_to_snowflake.py"
-    python_version  = "3"
+    python_version  = "3.9"
   }
 
   default_arguments = {
     "--job-language"                     = "python"
-    "--job-bookmark-option"              = "job-bookmark-disable"
-    "--enable-metrics"                   = "true"
     "--enable-continuous-cloudwatch-log" = "true"
-    "--enable-glue-datacatalog"          = "true"
     "--TempDir"                          = "s3://${var.s3_bucket_name}/temp/"
+    "library-set"                        = "analytics"
+    "--additional-python-modules"        = "snowflake-connector-python[pandas]"
     
     # Custom arguments
     "--SECRET_NAME"           = aws_secretsmanager_secret.snowflake.name
@@ -186,15 +169,10 @@ resource "aws_glue_job" "load_scores" {
     "--S3_PREFIX"             = "inference/output"
     "--TARGET_TABLE"          = var.snowflake_scores_table
     "--ID_COLUMN"             = var.id_column
-    
-    # Snowflake JDBC driver
-    "--extra-jars"            = "s3://${var.s3_bucket_name}/scripts/glue/snowflake-jdbc.jar"
   }
 
-  glue_version      = "4.0"
-  worker_type       = var.glue_worker_type
-  number_of_workers = var.glue_num_workers
-  timeout           = 60  # 1 hour max
+  max_capacity = 1  # Python shell: 0.0625 or 1 DPU
+  timeout      = 60  # 1 hour max
 
   execution_property {
     max_concurrent_runs = 1
@@ -22,8 +22,3 @@ output "load_scores_job_name" {
   description = "Name of the Glue job for loading scores to Snowflake"
   value       = aws_glue_job.load_scores.name
 }
-
-output "snowflake_connection_name" {
-  description = "Name of the Glue connection to Snowflake"
-  value       = aws_glue_connection.snowflake.name
-}
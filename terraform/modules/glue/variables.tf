@@ -20,11 +20,6 @@ variable "glue_role_arn" {
 }
 
 # Snowflake configuration
-variable "snowflake_account" {
-  description = "Snowflake account identifier (e.g., xy12345.us-east-1)"
-  type        = string
-}
-
 variable "snowflake_source_table" {
   description = "Fully qualified source table name"
   type        = string
@@ -43,12 +38,24 @@ variable "id_column" {
   default     = "VISIT_ID"  # UPDATE THIS based on your actual ID column
 }
 
+variable "snowflake_storage_integration" {
+  description = "Snowflake storage integration used to unload extracts to the S3 bucket"
+  type        = string
+  default     = "FRAUD_SCORING_S3"
+}
+
 variable "training_days_limit" {
   description = "Number of days of historical data for training"
   type        = number
   default     = 15
 }
 
+variable "inference_features_partitions" {
+  description = "Number of features CSV files for Batch Transform (0 = size from record count)"
+  type        = number
+  default     = 0
+}
+
 # Glue job sizing
 variable "glue_worker_type" {
   description = "Glue worker type (G.1X, G.2X, etc.)"
@@ -5,6 +5,7 @@
 # - Glue role (read Snowflake secrets, read/write S3)
 # - SageMaker role (read/write S3, CloudWatch logs)
 # - Step Functions role (invoke Glue, SageMaker)
+# - Snowflake unload role (assumed by the Snowflake storage integration)
 # =============================================================================
 
 data "aws_caller_identity" "current" {}
@@ -316,3 +317,78 @@ resource "aws_iam_role_policy" "eventbridge" {
     ]
   })
 }
+
+# =============================================================================
+# SNOWFLAKE UNLOAD ROLE (assumed by the FRAUD_SCORING_S3 storage integration)
+# =============================================================================
+# Snowflake only reports the IAM user and external ID to trust once the
+# integration exists (DESC INTEGRATION), and the integration needs this
+# role's ARN. Until snowflake_iam_user_arn is set the role trusts this
+# account only, so the first apply creates the ARN for CREATE STORAGE
+# INTEGRATION and a second apply hands the role to Snowflake.
+
+resource "aws_iam_role" "snowflake_unload" {
+  name = "${var.project_name}-snowflake-unload-${var.environment}"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Principal = {
+          AWS = var.snowflake_iam_user_arn != "" ? var.snowflake_iam_user_arn : "arn:aws:iam::${data.aws_caller_identity.current.account_id}:root"
+        }
+        Condition = {
+          StringEquals = {
+            "sts:ExternalId" = var.snowflake_external_id
+          }
+        }
+      }
+    ]
+  })
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+    ManagedBy   = "terraform"
+  }
+}
+
+# COPY INTO unloads only ever touch temp/snowflake_unload/
+resource "aws_iam_role_policy" "snowflake_unload" {
+  name = "${var.project_name}-snowflake-unload-policy-${var.environment}"
+  role = aws_iam_role.snowflake_unload.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:PutObject",
+          "s3:GetObject",
+          "s3:GetObjectVersion",
+          "s3:DeleteObject",
+          "s3:DeleteObjectVersion"
+        ]
+        Resource = "${var.s3_bucket_arn}/temp/snowflake_unload/*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = "s3:ListBucket"
+        Resource = var.s3_bucket_arn
+        Condition = {
+          StringLike = {
+            "s3:prefix" = ["temp/snowflake_unload/*"]
+          }
+        }
+      },
+      {
+        Effect   = "Allow"
+        Action   = "s3:GetBucketLocation"
+        Resource = var.s3_bucket_arn
+      }
+    ]
+  })
+}
@@ -27,3 +27,8 @@ output "eventbridge_role_arn" {
   description = "ARN of the EventBridge IAM role"
   value       = aws_iam_role.eventbridge.arn
 }
+
+output "snowflake_unload_role_arn" {
+  description = "ARN of the IAM role assumed by the Snowflake storage integration"
+  value       = aws_iam_role.snowflake_unload.arn
+}
@@ -13,3 +13,15 @@ variable "s3_bucket_arn" {
   description = "ARN of the S3 bucket for data storage"
   type        = string
 }
+
+variable "snowflake_iam_user_arn" {
+  description = "STORAGE_AWS_IAM_USER_ARN from DESC INTEGRATION (empty until the integration exists)"
+  type        = string
+  default     = ""
+}
+
+variable "snowflake_external_id" {
+  description = "STORAGE_AWS_EXTERNAL_ID from DESC INTEGRATION"
+  type        = string
+  default     = "0000"
+}
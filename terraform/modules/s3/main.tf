@@ -64,6 +64,40 @@ resource "aws_s3_bucket_lifecycle_configuration" "fraud_scoring" {
     }
   }
 
+  # Snowflake unload files are only read by the same Glue run. The bucket is
+  # versioned, so the expired (noncurrent) versions must be removed too.
+  rule {
+    id     = "snowflake-unload-cleanup"
+    status = "Enabled"
+
+    filter {
+      prefix = "temp/snowflake_unload/"
+    }
+
+    expiration {
+      days = 1
+    }
+
+    noncurrent_version_expiration {
+      noncurrent_days = 1
+    }
+  }
+
+  # Drop the delete markers left behind once their versions are gone
+  # (cannot share an expiration block with days)
+  rule {
+    id     = "snowflake-unload-delete-markers"
+    status = "Enabled"
+
+    filter {
+      prefix = "temp/snowflake_unload/"
+    }
+
+    expiration {
+      expired_object_delete_marker = true
+    }
+  }
+
   # Keep model artifacts longer (365 days)
   rule {
     id     = "models-archive"
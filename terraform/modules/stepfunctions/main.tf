@@ -56,7 +56,7 @@ resource "aws_sfn_state_machine" "training_pipeline" {
               DataSource = {
                 S3DataSource = {
                   S3DataType             = "S3Prefix"
-                  "S3Uri.$"              = "States.Format('s3://${var.s3_bucket_name}/training/data/{}/train', $$.Execution.StartTime)"
+                  "S3Uri.$"              = "States.Format('s3://${var.s3_bucket_name}/training/data/{}/DATA_SPLIT=TRAIN', $$.Execution.StartTime)"
                   S3DataDistributionType = "FullyReplicated"
                 }
               }
@@ -67,7 +67,7 @@ resource "aws_sfn_state_machine" "training_pipeline" {
               DataSource = {
                 S3DataSource = {
                   S3DataType             = "S3Prefix"
-                  "S3Uri.$"              = "States.Format('s3://${var.s3_bucket_name}/training/data/{}/test', $$.Execution.StartTime)"
+                  "S3Uri.$"              = "States.Format('s3://${var.s3_bucket_name}/training/data/{}/DATA_SPLIT=TEST', $$.Execution.StartTime)"
                   S3DataDistributionType = "FullyReplicated"
                 }
               }
@@ -193,13 +193,21 @@ resource "aws_sfn_state_machine" "inference_pipeline" {
                 "S3Uri.$"  = "States.Format('s3://${var.s3_bucket_name}/inference/input/{}/features', $$.State.EnteredTime)"
               }
             }
-            ContentType = "text/csv"
-            SplitType   = "Line"
+            ContentType     = "text/csv"
+            SplitType       = "Line"
+            CompressionType = "Gzip"
           }
           TransformOutput = {
             "S3OutputPath.$" = "States.Format('s3://${var.s3_bucket_name}/inference/output/{}', $$.State.EnteredTime)"
             AssembleWith     = "Line"
           }
+          # Input rows are "<id>,<features...>": hide the ID from the model
+          # and join it back onto the prediction so the output is "<id>,<score>"
+          DataProcessing = {
+            InputFilter  = "$[1:]"
+            JoinSource   = "Input"
+            OutputFilter = "$[0,-1]"
+          }
           TransformResources = {
             InstanceCount = var.transform_instance_count
             InstanceType  = var.transform_instance_type
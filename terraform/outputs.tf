@@ -56,6 +56,11 @@ output "sagemaker_role_arn" {
   value       = module.iam.sagemaker_role_arn
 }
 
+output "snowflake_unload_role_arn" {
+  description = "IAM role ARN for STORAGE_AWS_ROLE_ARN in CREATE STORAGE INTEGRATION"
+  value       = module.iam.snowflake_unload_role_arn
+}
+
 # Helpful commands
 output "next_steps" {
   description = "Next steps after deployment"
@@ -73,14 +78,11 @@ output "next_steps" {
     ║  2. Upload Glue scripts to S3:                                         ║
     ║     aws s3 cp glue_scripts/ s3://${module.s3.bucket_name}/scripts/glue/ --recursive ║
     ║                                                                        ║
-    ║  3. Upload Snowflake JDBC driver:                                      ║
-    ║     aws s3 cp snowflake-jdbc.jar s3://${module.s3.bucket_name}/scripts/glue/ ║
-    ║                                                                        ║
-    ║  4. Test training pipeline manually:                                   ║
+    ║  3. Test training pipeline manually:                                   ║
     ║     aws stepfunctions start-execution \                                ║
     ║       --state-machine-arn ${module.stepfunctions.training_pipeline_arn} ║
     ║                                                                        ║
-    ║  5. Enable schedules when ready:                                       ║
+    ║  4. Enable schedules when ready:                                       ║
     ║     Set enable_schedules = true in terragrunt.hcl                      ║
     ║                                                                        ║
     ╚════════════════════════════════════════════════════════════════════════╝
@@ -17,11 +17,6 @@ variable "environment" {
 # SNOWFLAKE CONFIGURATION
 # =============================================================================
 
-variable "snowflake_account" {
-  description = "Snowflake account identifier (e.g., xy12345.us-east-1)"
-  type        = string
-}
-
 variable "snowflake_source_table" {
   description = "Fully qualified source table name"
   type        = string
@@ -40,12 +35,36 @@ variable "id_column" {
   default     = "VISIT_ID"  # UPDATE THIS based on actual schema
 }
 
+variable "snowflake_storage_integration" {
+  description = "Snowflake storage integration used to unload extracts to the S3 bucket"
+  type        = string
+  default     = "FRAUD_SCORING_S3"
+}
+
+variable "snowflake_iam_user_arn" {
+  description = "STORAGE_AWS_IAM_USER_ARN from DESC INTEGRATION (empty until the integration exists)"
+  type        = string
+  default     = ""
+}
+
+variable "snowflake_external_id" {
+  description = "STORAGE_AWS_EXTERNAL_ID from DESC INTEGRATION"
+  type        = string
+  default     = "0000"
+}
+
 variable "training_days_limit" {
   description = "Number of days of historical data for training"
   type        = number
   default     = 15
 }
 
+variable "inference_features_partitions" {
+  description = "Number of features CSV files for Batch Transform (0 = size from record count)"
+  type        = number
+  default     = 0
+}
+
 # =============================================================================
 # GLUE CONFIGURATION
 # =============================================================================